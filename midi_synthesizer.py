@@ -3,26 +3,205 @@ MIDI Command Synthesizer
 Stores MIDI commands as a compact vector and synthesizes music from them.
 """
 
+import sys
+
 import numpy as np
 from midiutil import MIDIFile
+from collections import namedtuple
 from io import BytesIO
 import struct
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the pure-Python encoder still works
+    njit = None
+
+# Pulses per quarter note used by the direct serializer.
+TICKS_PER_BEAT = 480
+
+# Integer command-type codes stored in the type column. These are also the
+# tags used by the command-vector encoding.
+TYPE_NOTE_ON = 1
+TYPE_CONTROL_CHANGE = 2
+TYPE_PROGRAM_CHANGE = 3
+
+# Lightweight per-command views returned by the midi_commands property.
+Note = namedtuple('Note', ['pitch', 'velocity', 'duration', 'track', 'time'])
+ControlChange = namedtuple('ControlChange',
+                           ['controller', 'value', 'track', 'time'])
+ProgramChange = namedtuple('ProgramChange', ['program', 'track', 'time'])
+
+
+def _clip7(value):
+    """Clamp a scalar to the 7-bit MIDI range 0-127.
+
+    np.clip on a Python scalar goes through the full ufunc machinery;
+    a plain comparison chain is far cheaper for one value.
+    """
+    value = int(value)
+    return 0 if value < 0 else 127 if value > 127 else value
+
+
+def _encode_events(ticks, statuses, data1, data2, lo, hi, buf, pos):
+    """Encode sorted events as delta-timed MIDI bytes into `buf`.
+
+    Processes the event columns from index `lo` to `hi`, writing from byte
+    offset `pos` and returning the offset after the last event. Delta times
+    are written as variable-length quantities, unrolled for the four
+    possible widths. The body avoids Python objects so numba can compile
+    it unchanged; the interpreted version runs on the same arguments.
+    """
+    prev_tick = 0
+    for j in range(lo, hi):
+        tick = ticks[j]
+        delta = tick - prev_tick
+        prev_tick = tick
+        if delta < 0x80:
+            buf[pos] = delta
+            pos += 1
+        elif delta < 0x4000:
+            buf[pos] = 0x80 | (delta >> 7)
+            buf[pos + 1] = delta & 0x7F
+            pos += 2
+        elif delta < 0x200000:
+            buf[pos] = 0x80 | (delta >> 14)
+            buf[pos + 1] = 0x80 | ((delta >> 7) & 0x7F)
+            buf[pos + 2] = delta & 0x7F
+            pos += 3
+        else:
+            buf[pos] = 0x80 | (delta >> 21)
+            buf[pos + 1] = 0x80 | ((delta >> 14) & 0x7F)
+            buf[pos + 2] = 0x80 | ((delta >> 7) & 0x7F)
+            buf[pos + 3] = delta & 0x7F
+            pos += 4
+        buf[pos] = statuses[j]
+        buf[pos + 1] = data1[j]
+        pos += 2
+        value = data2[j]
+        # value < 0 marks a two-byte event.
+        if value >= 0:
+            buf[pos] = value
+            pos += 1
+    return pos
+
+
+_encode_events_jit = njit(_encode_events) if njit is not None else None
 
-class MIDICommandSynthesizer:
-    """Stores and synthesizes music from MIDI commands."""
 
-    def __init__(self, num_tracks=1, tempo=120):
+class MIDICommandSynthesizer:
+    """Stores and synthesizes music from MIDI commands.
+
+    Commands are stored in a struct-of-arrays layout: one numpy column per
+    field, grown by capacity doubling. This keeps each record compact and
+    lets encoding, decoding and sorting run as array operations instead of
+    per-command Python loops.
+    """
+
+    __slots__ = ('num_tracks', 'tempo', 'verbose', '_n',
+                 '_type', '_pitch', '_velocity', '_controller', '_value',
+                 '_program', '_duration_ticks', '_track', '_time_ticks')
+
+    # Column names and dtypes of the struct-of-arrays storage.
+    _COLUMNS = (
+        ('_type', np.int8),
+        ('_pitch', np.int16),
+        ('_velocity', np.int16),
+        ('_controller', np.int16),
+        ('_value', np.int16),
+        ('_program', np.int16),
+        ('_duration_ticks', np.int32),
+        ('_track', np.int16),
+        ('_time_ticks', np.int32),
+    )
+
+    def __init__(self, num_tracks=1, tempo=120, capacity=64, verbose=False):
         """
         Initialize the MIDI synthesizer.
 
         Args:
             num_tracks: Number of MIDI tracks
             tempo: Tempo in BPM
+            capacity: Initial capacity (in commands) of the storage arrays
+            verbose: Enable print_commands output
         """
         self.num_tracks = num_tracks
         self.tempo = tempo
-        self.midi_commands = []
+        self.verbose = verbose
+        self._n = 0
+        for name, dtype in self._COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def _reserve(self, extra):
+        """Ensure room for `extra` more commands, doubling capacity as needed.
+
+        Returns the index of the first free slot.
+        """
+        needed = self._n + extra
+        capacity = len(self._time_ticks)
+        if needed > capacity:
+            while capacity < needed:
+                capacity *= 2
+            for name, _ in self._COLUMNS:
+                setattr(self, name, np.resize(getattr(self, name), capacity))
+        return self._n
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def midi_commands(self):
+        """The stored commands as a list of named tuples (for inspection).
+
+        This reconstructs Python objects from the column arrays, so it is
+        intended for debugging and display rather than hot paths. Tuples
+        are far cheaper than the per-command dicts previously stored: no
+        hash table per record, and field access is a C-level index.
+        """
+        commands = []
+        for i in range(self._n):
+            cmd_type = self._type[i]
+            if cmd_type == TYPE_NOTE_ON:
+                commands.append(Note(
+                    pitch=int(self._pitch[i]),
+                    velocity=int(self._velocity[i]),
+                    duration=float(self._duration_ticks[i]) / TICKS_PER_BEAT,
+                    track=int(self._track[i]),
+                    time=float(self._time_ticks[i]) / TICKS_PER_BEAT
+                ))
+            elif cmd_type == TYPE_CONTROL_CHANGE:
+                commands.append(ControlChange(
+                    controller=int(self._controller[i]),
+                    value=int(self._value[i]),
+                    track=int(self._track[i]),
+                    time=float(self._time_ticks[i]) / TICKS_PER_BEAT
+                ))
+            elif cmd_type == TYPE_PROGRAM_CHANGE:
+                commands.append(ProgramChange(
+                    program=int(self._program[i]),
+                    track=int(self._track[i]),
+                    time=float(self._time_ticks[i]) / TICKS_PER_BEAT
+                ))
+        return commands
+
+    def numpy(self):
+        """
+        Get the command columns as numpy arrays.
+
+        Returns:
+            dict mapping column names to array views over the stored commands
+        """
+        n = self._n
+        return {
+            'type': self._type[:n],
+            'pitch': self._pitch[:n],
+            'velocity': self._velocity[:n],
+            'controller': self._controller[:n],
+            'value': self._value[:n],
+            'program': self._program[:n],
+            'duration_ticks': self._duration_ticks[:n],
+            'track': self._track[:n],
+            'time_ticks': self._time_ticks[:n],
+        }
 
     def add_note(self, pitch, duration, velocity=100, track=0, time=0):
         """
@@ -35,15 +214,44 @@ class MIDICommandSynthesizer:
             track: Track number
             time: Start time in beats
         """
-        command = {
-            'type': 'note_on',
-            'pitch': int(np.clip(pitch, 0, 127)),
-            'velocity': int(np.clip(velocity, 0, 127)),
-            'duration': float(duration),
-            'track': int(track),
-            'time': float(time)
-        }
-        self.midi_commands.append(command)
+        i = self._reserve(1)
+        self._type[i] = TYPE_NOTE_ON
+        self._pitch[i] = _clip7(pitch)
+        self._velocity[i] = _clip7(velocity)
+        self._duration_ticks[i] = int(round(float(duration)
+                                           * TICKS_PER_BEAT))
+        self._track[i] = int(track)
+        self._time_ticks[i] = int(round(float(time) * TICKS_PER_BEAT))
+        self._n = i + 1
+        return self
+
+    def add_notes(self, pitches, durations, velocities=100, tracks=0,
+                  times=None):
+        """
+        Add a batch of notes in a single vectorized append.
+
+        Scalar arguments are broadcast across the batch, so e.g. a common
+        duration or velocity can be passed once for all notes.
+
+        Args:
+            pitches: array-like of MIDI pitches (0-127)
+            durations: duration(s) in beats
+            velocities: note velocity(ies) (0-127)
+            tracks: track number(s)
+            times: start time(s) in beats (defaults to 0)
+        """
+        pitches = np.asarray(pitches)
+        k = pitches.shape[0]
+        i = self._reserve(k)
+        self._type[i:i+k] = TYPE_NOTE_ON
+        self._pitch[i:i+k] = np.clip(pitches, 0, 127)
+        self._velocity[i:i+k] = np.clip(velocities, 0, 127)
+        self._duration_ticks[i:i+k] = np.rint(
+            np.multiply(durations, TICKS_PER_BEAT))
+        self._track[i:i+k] = tracks
+        self._time_ticks[i:i+k] = 0 if times is None else np.rint(
+            np.multiply(times, TICKS_PER_BEAT))
+        self._n = i + k
         return self
 
     def add_control_change(self, controller, value, track=0, time=0):
@@ -56,14 +264,13 @@ class MIDICommandSynthesizer:
             track: Track number
             time: Time in beats
         """
-        command = {
-            'type': 'control_change',
-            'controller': int(np.clip(controller, 0, 127)),
-            'value': int(np.clip(value, 0, 127)),
-            'track': int(track),
-            'time': float(time)
-        }
-        self.midi_commands.append(command)
+        i = self._reserve(1)
+        self._type[i] = TYPE_CONTROL_CHANGE
+        self._controller[i] = _clip7(controller)
+        self._value[i] = _clip7(value)
+        self._track[i] = int(track)
+        self._time_ticks[i] = int(round(float(time) * TICKS_PER_BEAT))
+        self._n = i + 1
         return self
 
     def add_program_change(self, program, track=0, time=0):
@@ -75,13 +282,12 @@ class MIDICommandSynthesizer:
             track: Track number
             time: Time in beats
         """
-        command = {
-            'type': 'program_change',
-            'program': int(np.clip(program, 0, 127)),
-            'track': int(track),
-            'time': float(time)
-        }
-        self.midi_commands.append(command)
+        i = self._reserve(1)
+        self._type[i] = TYPE_PROGRAM_CHANGE
+        self._program[i] = _clip7(program)
+        self._track[i] = int(track)
+        self._time_ticks[i] = int(round(float(time) * TICKS_PER_BEAT))
+        self._n = i + 1
         return self
 
     def get_command_vector(self):
@@ -92,21 +298,36 @@ class MIDICommandSynthesizer:
         Returns:
             numpy array of command data
         """
-        vector = []
-        for cmd in self.midi_commands:
-            if cmd['type'] == 'note_on':
-                # Format: [1, pitch, velocity, duration, track, time]
-                vector.extend([1, cmd['pitch'], cmd['velocity'],
-                              cmd['duration'], cmd['track'], cmd['time']])
-            elif cmd['type'] == 'control_change':
-                # Format: [2, controller, value, track, time, 0]
-                vector.extend([2, cmd['controller'], cmd['value'],
-                              cmd['track'], cmd['time'], 0])
-            elif cmd['type'] == 'program_change':
-                # Format: [3, program, track, time, 0, 0]
-                vector.extend([3, cmd['program'], cmd['track'],
-                              cmd['time'], 0, 0])
-        return np.array(vector, dtype=np.float32)
+        n = self._n
+        out = np.zeros((n, 6), dtype=np.float32)
+        types = self._type[:n]
+        out[:, 0] = types
+        times = self._time_ticks[:n].astype(np.float32) / TICKS_PER_BEAT
+        durations = (self._duration_ticks[:n].astype(np.float32)
+                     / TICKS_PER_BEAT)
+
+        # Format: [1, pitch, velocity, duration, track, time]
+        note = types == TYPE_NOTE_ON
+        out[note, 1] = self._pitch[:n][note]
+        out[note, 2] = self._velocity[:n][note]
+        out[note, 3] = durations[note]
+        out[note, 4] = self._track[:n][note]
+        out[note, 5] = times[note]
+
+        # Format: [2, controller, value, track, time, 0]
+        cc = types == TYPE_CONTROL_CHANGE
+        out[cc, 1] = self._controller[:n][cc]
+        out[cc, 2] = self._value[:n][cc]
+        out[cc, 3] = self._track[:n][cc]
+        out[cc, 4] = times[cc]
+
+        # Format: [3, program, track, time, 0, 0]
+        pc = types == TYPE_PROGRAM_CHANGE
+        out[pc, 1] = self._program[:n][pc]
+        out[pc, 2] = self._track[:n][pc]
+        out[pc, 3] = times[pc]
+
+        return out.ravel()
 
     def load_from_vector(self, vector):
         """
@@ -115,116 +336,306 @@ class MIDICommandSynthesizer:
         Args:
             vector: numpy array of command data
         """
-        self.midi_commands = []
-        vector = np.array(vector, dtype=np.float32)
-
-        i = 0
-        while i < len(vector):
-            cmd_type = int(vector[i])
-
-            if cmd_type == 1:  # note_on
-                self.add_note(
-                    pitch=int(vector[i+1]),
-                    velocity=int(vector[i+2]),
-                    duration=float(vector[i+3]),
-                    track=int(vector[i+4]),
-                    time=float(vector[i+5])
-                )
-                i += 6
-            elif cmd_type == 2:  # control_change
-                self.add_control_change(
-                    controller=int(vector[i+1]),
-                    value=int(vector[i+2]),
-                    track=int(vector[i+3]),
-                    time=float(vector[i+4])
-                )
-                i += 6
-            elif cmd_type == 3:  # program_change
-                self.add_program_change(
-                    program=int(vector[i+1]),
-                    track=int(vector[i+2]),
-                    time=float(vector[i+3])
-                )
-                i += 6
-            else:
-                i += 1
-
+        self._n = 0
+        # asarray is a zero-copy view when the input is already float32;
+        # the decode below only reads from it.
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.size % 6:
+            raise ValueError(
+                f"command vector length must be a multiple of 6, "
+                f"got {vector.size}")
+        matrix = vector.reshape(-1, 6)
+        types = matrix[:, 0].astype(np.int8)
+
+        # Drop rows with unknown type codes.
+        known = (types >= TYPE_NOTE_ON) & (types <= TYPE_PROGRAM_CHANGE)
+        if not known.all():
+            matrix = matrix[known]
+            types = types[known]
+
+        k = matrix.shape[0]
+        self._reserve(k)
+        self._type[:k] = types
+
+        # Format: [1, pitch, velocity, duration, track, time]
+        note = types == TYPE_NOTE_ON
+        self._pitch[:k][note] = np.clip(matrix[note, 1], 0, 127)
+        self._velocity[:k][note] = np.clip(matrix[note, 2], 0, 127)
+        self._duration_ticks[:k][note] = np.rint(
+            matrix[note, 3].astype(np.float64) * TICKS_PER_BEAT)
+        self._track[:k][note] = matrix[note, 4]
+        self._time_ticks[:k][note] = np.rint(
+            matrix[note, 5].astype(np.float64) * TICKS_PER_BEAT)
+
+        # Format: [2, controller, value, track, time, 0]
+        cc = types == TYPE_CONTROL_CHANGE
+        self._controller[:k][cc] = np.clip(matrix[cc, 1], 0, 127)
+        self._value[:k][cc] = np.clip(matrix[cc, 2], 0, 127)
+        self._track[:k][cc] = matrix[cc, 3]
+        self._time_ticks[:k][cc] = np.rint(
+            matrix[cc, 4].astype(np.float64) * TICKS_PER_BEAT)
+
+        # Format: [3, program, track, time, 0, 0]
+        pc = types == TYPE_PROGRAM_CHANGE
+        self._program[:k][pc] = np.clip(matrix[pc, 1], 0, 127)
+        self._track[:k][pc] = matrix[pc, 2]
+        self._time_ticks[:k][pc] = np.rint(
+            matrix[pc, 3].astype(np.float64) * TICKS_PER_BEAT)
+
+        self._n = k
         return self
 
-    def synthesize_to_file(self, filename):
+    def synthesize_to_file(self, filename, use_midiutil=False):
         """
         Synthesize MIDI commands to a MIDI file.
 
         Args:
             filename: Output filename for the MIDI file
+            use_midiutil: Render through midiutil instead of the direct
+                byte-level serializer
         """
-        # Create MIDI object
-        midi = MIDIFile(self.num_tracks)
+        if use_midiutil:
+            data = self._render_with_midiutil()
+        else:
+            data = self._render_midi_bytes()
 
-        # Set tempo for all tracks
-        for track in range(self.num_tracks):
-            midi.addTempo(track, 0, self.tempo)
+        with open(filename, 'wb') as output_file:
+            output_file.write(data)
 
-        # Sort commands by time
-        sorted_commands = sorted(self.midi_commands, key=lambda x: x['time'])
+        print(f"MIDI file saved to: {filename}")
+
+    def _render_midi_bytes(self):
+        """Serialize the stored commands to Standard MIDI File bytes.
+
+        Emits the MThd/MTrk chunks directly into preallocated bytearrays
+        with struct.pack_into and variable-length delta encoding, skipping
+        midiutil's per-event objects and small struct.pack calls.
+        """
+        n = self._n
+        num_tracks = self.num_tracks
+        tempo_usec = int(60000000 / self.tempo)
+
+        types = self._type[:n]
+        tracks = self._track[:n].astype(np.int64)
+        ticks = self._time_ticks[:n].astype(np.int64)
+        if n and (tracks.min() < 0 or tracks.max() >= num_tracks):
+            raise IndexError("track number out of range")
+
+        note = types == TYPE_NOTE_ON
+        cc = types == TYPE_CONTROL_CHANGE
+        pc = types == TYPE_PROGRAM_CHANGE
+        n_note = int(note.sum())
+
+        # Assemble the event stream as parallel arrays: each note command
+        # contributes a note_on and a note_off (at tick + duration), each
+        # control/program change a single event. The note_on and note_off
+        # streams inherit the commands' time order, so they arrive as long
+        # pre-sorted runs that the stable merge below exploits.
+        pitches = self._pitch[:n][note].astype(np.int64)
+        on_ticks = ticks[note]
+        off_ticks = on_ticks + self._duration_ticks[:n][note].astype(np.int64)
+
+        ev_track = np.concatenate([tracks[note], tracks[note],
+                                   tracks[cc], tracks[pc]])
+        ev_tick = np.concatenate([on_ticks, off_ticks, ticks[cc], ticks[pc]])
+        # Same-tick ordering: program changes, control changes, note_offs,
+        # then note_ons.
+        ev_order = np.concatenate([
+            np.full(n_note, 4, np.int64), np.full(n_note, 3, np.int64),
+            np.full(int(cc.sum()), 2, np.int64),
+            np.full(int(pc.sum()), 1, np.int64)])
+        ev_status = np.concatenate([
+            np.full(n_note, 0x90, np.int64), np.full(n_note, 0x80, np.int64),
+            np.full(int(cc.sum()), 0xB0, np.int64),
+            np.full(int(pc.sum()), 0xC0, np.int64)])
+        ev_data1 = np.concatenate([
+            pitches, pitches,
+            self._controller[:n][cc].astype(np.int64),
+            self._program[:n][pc].astype(np.int64)])
+        # data2 < 0 marks a two-byte event.
+        ev_data2 = np.concatenate([
+            self._velocity[:n][note].astype(np.int64),
+            np.zeros(n_note, np.int64),
+            self._value[:n][cc].astype(np.int64),
+            np.full(int(pc.sum()), -1, np.int64)])
+
+        order = np.lexsort((ev_data2, ev_data1, ev_status, ev_order,
+                            ev_tick, ev_track))
+        ev_track = ev_track[order]
+        ev_tick = ev_tick[order]
+        ev_status = ev_status[order]
+        ev_data1 = ev_data1[order]
+        ev_data2 = ev_data2[order]
+
+        # Drop exact duplicates, matching midiutil's removeDuplicates
+        # default. Sorted order makes duplicates adjacent.
+        if len(ev_tick):
+            keep = np.empty(len(ev_tick), dtype=bool)
+            keep[0] = True
+            keep[1:] = ((np.diff(ev_track) != 0) | (np.diff(ev_tick) != 0)
+                        | (np.diff(ev_status) != 0) | (np.diff(ev_data1) != 0)
+                        | (np.diff(ev_data2) != 0))
+            ev_track = ev_track[keep]
+            ev_tick = ev_tick[keep]
+            ev_status = ev_status[keep]
+            ev_data1 = ev_data1[keep]
+            ev_data2 = ev_data2[keep]
+
+        # Per-track ranges in the sorted stream.
+        starts = np.searchsorted(ev_track, np.arange(num_tracks), side='left')
+        ends = np.searchsorted(ev_track, np.arange(num_tracks), side='right')
+
+        # With numba the encoder runs compiled over the arrays; otherwise
+        # plain Python iterates the equivalent lists, which index faster
+        # than ndarrays.
+        if _encode_events_jit is not None:
+            encode = _encode_events_jit
+            tick_seq, status_seq = ev_tick, ev_status
+            data1_seq, data2_seq = ev_data1, ev_data2
+        else:
+            encode = _encode_events
+            tick_seq, status_seq = ev_tick.tolist(), ev_status.tolist()
+            data1_seq, data2_seq = ev_data1.tolist(), ev_data2.tolist()
+
+        chunks = [struct.pack('>4sIHHH', b'MThd', 6, 1, num_tracks,
+                              TICKS_PER_BEAT)]
+        for track in range(num_tracks):
+            lo, hi = int(starts[track]), int(ends[track])
+            # Worst case 8 bytes per event (4-byte delta + 3-byte event),
+            # plus tempo meta and end-of-track.
+            buf = np.zeros(16 + 8 * (hi - lo), dtype=np.uint8)
+            pos = 0
+            if track == 0:
+                # Tempo meta event at tick 0.
+                buf[:7] = np.frombuffer(
+                    b'\x00\xff\x51\x03' + tempo_usec.to_bytes(3, 'big'),
+                    dtype=np.uint8)
+                pos = 7
+            pos = int(encode(tick_seq, status_seq, data1_seq, data2_seq,
+                             lo, hi, buf, pos))
+            # End of track meta event.
+            buf[pos:pos + 4] = np.frombuffer(b'\x00\xff\x2f\x00',
+                                             dtype=np.uint8)
+            pos += 4
+            chunks.append(struct.pack('>4sI', b'MTrk', pos))
+            chunks.append(buf[:pos].tobytes())
+
+        return b''.join(chunks)
+
+    def _render_with_midiutil(self):
+        """Serialize the stored commands through midiutil.
+
+        Returns:
+            bytes of the rendered MIDI file
+        """
+        # Create MIDI object in tick mode: passing the stored integer ticks
+        # straight through skips midiutil's per-event beat-to-tick float
+        # conversion and quantization work. (Its event lists are plain
+        # Python lists, so there is nothing to preallocate; feeding events
+        # pre-sorted below keeps its internal sort cheap instead.)
+        num_tracks = self.num_tracks
+        midi = MIDIFile(num_tracks,
+                        ticks_per_quarternote=TICKS_PER_BEAT,
+                        eventtime_is_ticks=True)
+
+        # Set tempo for all tracks
+        tempo = self.tempo
+        for track in range(num_tracks):
+            midi.addTempo(track, 0, tempo)
+
+        # Sort commands by time. Notes are usually added in time order, so
+        # check for that first and skip the sort entirely when it holds.
+        times = self._time_ticks[:self._n]
+        if times.size and not np.all(np.diff(times) >= 0):
+            order = np.argsort(times, kind='stable')
+        else:
+            order = range(self._n)
+
+        # Bind the column arrays and midiutil's bound methods once so the
+        # dispatch loop below runs on locals instead of repeating the
+        # attribute lookups per command.
+        types = self._type
+        pitches = self._pitch
+        velocities = self._velocity
+        controllers = self._controller
+        values = self._value
+        programs = self._program
+        tracks = self._track
+        time_ticks = self._time_ticks
+        duration_ticks = self._duration_ticks
+        add_note = midi.addNote
+        add_cc = midi.addControllerEvent
+        add_pc = midi.addProgramChange
 
         # Process commands
-        for cmd in sorted_commands:
-            track = cmd['track']
-            time = cmd['time']
+        for i in order:
+            track = int(tracks[i])
+            time = int(time_ticks[i])
+            cmd_type = types[i]
 
-            if cmd['type'] == 'note_on':
-                midi.addNote(
+            if cmd_type == TYPE_NOTE_ON:  # note_on
+                add_note(
                     track=track,
                     channel=0,
-                    pitch=cmd['pitch'],
+                    pitch=int(pitches[i]),
                     time=time,
-                    duration=cmd['duration'],
-                    volume=cmd['velocity']
+                    duration=int(duration_ticks[i]),
+                    volume=int(velocities[i])
                 )
-            elif cmd['type'] == 'control_change':
-                midi.addControllerEvent(
+            elif cmd_type == TYPE_CONTROL_CHANGE:  # control_change
+                add_cc(
                     track=track,
                     channel=0,
                     time=time,
-                    controller=cmd['controller'],
-                    value=cmd['value']
+                    controller=int(controllers[i]),
+                    value=int(values[i])
                 )
-            elif cmd['type'] == 'program_change':
-                midi.addProgramChange(
+            elif cmd_type == TYPE_PROGRAM_CHANGE:  # program_change
+                add_pc(
                     track,
                     0,
                     time,
-                    cmd['program']
+                    int(programs[i])
                 )
 
-        # Write to file
-        with open(filename, 'wb') as output_file:
-            midi.writeFile(output_file)
+        # Serialize to memory: writeFile issues many small writes, so
+        # staging in a BytesIO collapses them into a single file write.
+        buffer = BytesIO()
+        midi.writeFile(buffer)
+        return buffer.getvalue()
 
-        print(f"MIDI file saved to: {filename}")
+    def print_commands(self, limit=None):
+        """Print the stored MIDI commands in one buffered write.
 
-    def print_commands(self):
-        """Print all stored MIDI commands."""
-        print("\nStored MIDI Commands:")
-        print("-" * 70)
-        for i, cmd in enumerate(self.midi_commands):
-            print(f"{i}: {cmd}")
-        print("-" * 70)
+        A no-op unless the synthesizer was created with verbose=True, so
+        scores of any size don't pay for per-command string formatting by
+        default.
+
+        Args:
+            limit: Maximum number of commands to show (all by default)
+        """
+        if not self.verbose:
+            return
+        commands = self.midi_commands
+        if limit is not None:
+            commands = commands[:limit]
+        body = ''.join(f"{i}: {cmd}\n" for i, cmd in enumerate(commands))
+        sys.stdout.write("\nStored MIDI Commands:\n" + "-" * 70 + "\n"
+                         + body + "-" * 70 + "\n")
 
 
 def demo_simple_melody():
     """Create and synthesize a simple melody."""
     print("\n=== Creating Simple Melody ===")
 
-    synth = MIDICommandSynthesizer(tempo=120)
+    synth = MIDICommandSynthesizer(tempo=120, verbose=True)
 
     # Define a simple melody (C Major scale)
     # C, D, E, F, G, A, B, C (octave up)
-    pitches = [60, 62, 64, 65, 67, 69, 71, 72]
+    pitches = np.array([60, 62, 64, 65, 67, 69, 71, 72])
 
-    for i, pitch in enumerate(pitches):
-        synth.add_note(pitch=pitch, duration=1.0, velocity=100, time=i)
+    synth.add_notes(pitches, durations=1.0, velocities=100,
+                    times=np.arange(len(pitches)))
 
     synth.print_commands()
 
@@ -243,7 +654,7 @@ def demo_chord_progression():
     """Create and synthesize a chord progression."""
     print("\n=== Creating Chord Progression ===")
 
-    synth = MIDICommandSynthesizer(tempo=100)
+    synth = MIDICommandSynthesizer(tempo=100, verbose=True)
 
     # Set instrument to piano
     synth.add_program_change(program=0, track=0, time=0)
@@ -283,7 +694,7 @@ def demo_rhythm_pattern():
     """Create and synthesize a rhythm pattern."""
     print("\n=== Creating Rhythm Pattern ===")
 
-    synth = MIDICommandSynthesizer(tempo=140)
+    synth = MIDICommandSynthesizer(tempo=140, verbose=True)
 
     # Set instrument to drums (channel 9 is drums, but we'll use program 0)
     synth.add_program_change(program=0, track=0, time=0)
@@ -296,12 +707,16 @@ def demo_rhythm_pattern():
         (64, 0.25),
     ]
 
+    # Precompute each step's offset within the pattern so every note is an
+    # O(1) lookup (pattern.index would rescan the pattern per note and
+    # collides on repeated steps).
+    durations = np.array([d for _, d in pattern], dtype=np.float32)
+    offsets = np.concatenate(([0], np.cumsum(durations)[:-1]))
+
     for repeat in range(4):
-        for note_pitch, duration in pattern:
-            time = repeat * 2 + \
-                sum([d for _, d in pattern[:pattern.index((note_pitch, duration))]])
+        for step, (note_pitch, duration) in enumerate(pattern):
             synth.add_note(pitch=note_pitch, duration=duration,
-                           velocity=100, time=time)
+                           velocity=100, time=repeat * 2 + offsets[step])
 
     synth.print_commands()
 